@@ -1,24 +1,50 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from pymongo import MongoClient
-from typing import Optional, List
+from fastapi.concurrency import run_in_threadpool
+from pydantic import AliasChoices, BaseModel, Field
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, Optional, List
 from datetime import datetime, timedelta
+from cachetools import TTLCache
+from passlib.context import CryptContext
+import asyncio
+import base64
+import logging
 import os
 import hashlib
+import hmac
+import time
 import uuid
 import jwt
+import orjson
 import random
+import secrets
 import json
 
 # Environment variables
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/')
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-here')
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '20'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '5'))
 TRX_RECEIVE_ADDRESS = "TFNHcYdhEq5sgjaWPdR1Gnxgzu3RUKncwu"
+REFER_CODE_ATTEMPTS = 5
+SETTLE_INTERVAL_SECONDS = int(os.environ.get('SETTLE_INTERVAL_SECONDS', '30'))
+
+logger = logging.getLogger(__name__)
 
 # MongoDB connection
-client = MongoClient(MONGO_URL)
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=60000,
+    serverSelectionTimeoutMS=3000,
+    retryWrites=True
+)
 db = client.trx_mining_db
 
 # Collections
@@ -28,7 +54,7 @@ transactions_collection = db.transactions
 referrals_collection = db.referrals
 
 # FastAPI app
-app = FastAPI(title="TRX Mining Node API")
+app = FastAPI(title="TRX Mining Node API", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -41,6 +67,18 @@ app.add_middleware(
 
 security = HTTPBearer()
 
+pwd_context = CryptContext(schemes=["argon2"])
+
+# Verified against when a login names an unknown user, so the response takes
+# as long as a wrong password and doesn't reveal which usernames exist
+_DUMMY_PASSWORD_HASH = pwd_context.hash(secrets.token_urlsafe(16))
+
+# Shared JWT codec with claim checks fixed up front
+_jwt = jwt.PyJWT(options={"require": ["exp"], "verify_aud": False, "verify_iss": False})
+
+# Verified JWTs, keyed by sha256(token) -> (user_id, exp)
+_jwt_cache = TTLCache(maxsize=10_000, ttl=30)
+
 # Node configurations
 NODE_CONFIGS = {
     "node1": {
@@ -73,6 +111,41 @@ NODE_CONFIGS = {
     }
 }
 
+# Status reported by /api/nodes for nodes the user doesn't own
+UNOWNED_NODE_STATUS = {
+    node_id: {
+        "config": config,
+        "owned": False,
+        "active": False,
+        "progress": 0,
+        "can_rebuy": True,
+        "purchase_time": None
+    }
+    for node_id, config in NODE_CONFIGS.items()
+}
+
+# Mock withdrawal ranges (amount in TRX, age in seconds)
+MOCK_WITHDRAWAL_AMOUNTS = range(25, 10001)
+MOCK_WITHDRAWAL_OFFSETS = range(0, 3601)
+MOCK_WITHDRAWALS_REFRESH_SECONDS = 1
+
+# MongoDB projections
+PROFILE_FIELDS = {
+    "username": 1,
+    "refer_code": 1,
+    "mine_balance": 1,
+    "referral_balance": 1,
+    "has_purchased_node": 1,
+    "has_purchased_node4": 1
+}
+
+WITHDRAW_FIELDS = {
+    "mine_balance": 1,
+    "referral_balance": 1,
+    "has_purchased_node": 1,
+    "has_purchased_node4": 1
+}
+
 # Pydantic models
 class UserSignup(BaseModel):
     username: str
@@ -95,30 +168,86 @@ class MockWithdrawal(BaseModel):
     amount: float
     timestamp: datetime
 
+class UserOut(BaseModel):
+    id: str = Field(validation_alias=AliasChoices("id", "_id"))
+    username: str
+    refer_code: str
+    mine_balance: float
+    referral_balance: float
+
+class ProfileUserOut(UserOut):
+    has_purchased_node: bool = False
+    has_purchased_node4: bool = False
+
+class LoginResponse(BaseModel):
+    success: bool
+    token: str
+    user: UserOut
+
+class SignupResponse(LoginResponse):
+    message: str
+
+class ProfileResponse(BaseModel):
+    user: ProfileUserOut
+
+class NodeConfig(BaseModel):
+    name: str
+    price: int
+    mining_amount: int
+    duration_days: int
+    gb: int
+
+class NodeStatus(BaseModel):
+    config: NodeConfig
+    owned: bool
+    active: bool
+    progress: float
+    can_rebuy: bool
+    purchase_time: Optional[datetime]
+
+class NodesResponse(BaseModel):
+    nodes: Dict[str, NodeStatus]
+
 # Helper functions
 def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    return pwd_context.hash(password)
+
+def verify_password(password: str, hashed: str) -> bool:
+    # Accounts created before argon2 store an unsalted SHA-256 hex digest
+    if pwd_context.identify(hashed) is None:
+        return hmac.compare_digest(hashed, hashlib.sha256(password.encode()).hexdigest())
+    return pwd_context.verify(password, hashed)
 
 def generate_refer_code() -> str:
-    return str(uuid.uuid4())[:8].upper()
+    return base64.b32encode(secrets.token_bytes(5)).decode()
 
 def create_jwt_token(user_id: str) -> str:
     payload = {
         "user_id": user_id,
         "exp": datetime.utcnow() + timedelta(days=7)
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+    return _jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 def verify_jwt_token(token: str) -> str:
+    key = hashlib.sha256(token.encode()).digest()
+    cached = _jwt_cache.get(key)
+    if cached is not None:
+        user_id, exp = cached
+        if time.time() < exp:
+            return user_id
+        _jwt_cache.pop(key, None)
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        payload = _jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        _jwt_cache[key] = (payload["user_id"], payload["exp"])
         return payload["user_id"]
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+# async so it runs on the event loop: FastAPI would run a sync dependency in
+# its threadpool, and _jwt_cache (a cachetools TTLCache) is not thread-safe
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     return verify_jwt_token(credentials.credentials)
 
 def mock_verify_trx_transaction(tx_hash: str, expected_amount: float) -> bool:
@@ -132,40 +261,173 @@ def calculate_mining_progress(node):
         return 0
     
     purchase_time = node["purchase_time"]
+    completion_time = node.get("completion_time") or purchase_time + timedelta(days=node["duration_days"])
     now = datetime.utcnow()
-    duration = timedelta(days=node["duration_days"])
     
-    if now >= purchase_time + duration:
+    if now >= completion_time:
         return 100
     
-    elapsed = now - purchase_time
-    progress = (elapsed.total_seconds() / duration.total_seconds()) * 100
+    progress = ((now - purchase_time) / (completion_time - purchase_time)) * 100
     return min(progress, 100)
 
+def generate_mock_withdrawals():
+    """Generate mock withdrawal data for homepage animation"""
+    now = datetime.utcnow()
+    amounts = random.choices(MOCK_WITHDRAWAL_AMOUNTS, k=10)
+    offsets = random.choices(MOCK_WITHDRAWAL_OFFSETS, k=10)
+    mock_withdrawals = [
+        {"amount": amount, "timestamp": now - timedelta(seconds=offset)}
+        for amount, offset in zip(amounts, offsets)
+    ]
+    return {"withdrawals": mock_withdrawals}
+
+# Pre-serialized responses for the public endpoints
+_CONFIG_JSON = orjson.dumps({"trx_address": TRX_RECEIVE_ADDRESS, "nodes": NODE_CONFIGS})
+_mock_withdrawals_json = orjson.dumps(generate_mock_withdrawals())
+
+async def refresh_mock_withdrawals_loop():
+    global _mock_withdrawals_json
+    while True:
+        await asyncio.sleep(MOCK_WITHDRAWALS_REFRESH_SECONDS)
+        _mock_withdrawals_json = orjson.dumps(generate_mock_withdrawals())
+
+# Background settlement
+# Settlements this worker flagged credited. Their user markers are pulled on
+# the next tick, an interval later, so another worker's settler that picked
+# the same settlement up as pending is done with it by then
+_flagged_settlements: List[str] = []
+
+async def credit_settlement(settlement_id: str):
+    """Add a claimed settlement's rewards to mine_balance, then mark its nodes credited.
+    
+    Safe to re-run after a failure at any step, and from several workers at
+    once: only nodes not yet flagged are summed, and each user records the
+    settlement in `settlements` in the same write that credits it, so a user is
+    never credited twice.
+    """
+    already_credited = {"$in": [settlement_id, {"$ifNull": ["$settlements", []]}]}
+    await nodes_collection.aggregate([
+        {"$match": {"settlement_id": settlement_id, "credited": False}},
+        {"$group": {"_id": "$user_id", "total": {"$sum": "$mining_amount"}}},
+        {"$merge": {
+            "into": "users",
+            "on": "_id",
+            "whenMatched": [{"$set": {
+                "mine_balance": {"$cond": [
+                    already_credited,
+                    "$mine_balance",
+                    {"$add": ["$mine_balance", "$$new.total"]}
+                ]},
+                "settlements": {"$setUnion": [{"$ifNull": ["$settlements", []]}, [settlement_id]]}
+            }}],
+            "whenNotMatched": "discard"
+        }}
+    ]).to_list(length=None)
+    
+    await nodes_collection.update_many(
+        {"settlement_id": settlement_id},
+        {"$set": {"credited": True}}
+    )
+    _flagged_settlements.append(settlement_id)
+
+async def settle_completed_nodes():
+    """Credit mining rewards for every node whose mining period has ended"""
+    # The markers are only needed until the nodes are flagged
+    if _flagged_settlements:
+        flagged = _flagged_settlements[:]
+        _flagged_settlements.clear()
+        await users_collection.update_many(
+            {"settlements": {"$in": flagged}},
+            {"$pull": {"settlements": {"$in": flagged}}}
+        )
+    
+    # Finish settlements an earlier tick claimed but failed to credit
+    pending = await nodes_collection.distinct("settlement_id", {"credited": False})
+    for settlement_id in pending:
+        await credit_settlement(settlement_id)
+    
+    # Claim the due nodes first so concurrent settlers never credit a node twice
+    settlement_id = str(uuid.uuid4())
+    result = await nodes_collection.update_many(
+        {"completed": False, "active": True, "completion_time": {"$lte": datetime.utcnow()}},
+        {"$set": {"completed": True, "active": False, "settlement_id": settlement_id, "credited": False}}
+    )
+    if not result.modified_count:
+        return
+    
+    await credit_settlement(settlement_id)
+
+async def settle_loop():
+    while True:
+        await asyncio.sleep(SETTLE_INTERVAL_SECONDS)
+        try:
+            await settle_completed_nodes()
+        except Exception:
+            logger.exception("Node settlement failed")
+
+# Startup
+@app.on_event("startup")
+async def start_settle_loop():
+    app.state.settle_task = asyncio.create_task(settle_loop())
+
+@app.on_event("shutdown")
+async def stop_settle_loop():
+    app.state.settle_task.cancel()
+
+@app.on_event("startup")
+async def start_mock_withdrawals_loop():
+    app.state.mock_withdrawals_task = asyncio.create_task(refresh_mock_withdrawals_loop())
+
+@app.on_event("shutdown")
+async def stop_mock_withdrawals_loop():
+    app.state.mock_withdrawals_task.cancel()
+
+@app.on_event("startup")
+async def create_indexes():
+    await users_collection.create_index("username", unique=True)
+    await users_collection.create_index("refer_code", unique=True)
+    await nodes_collection.create_index([("user_id", 1), ("active", 1)])
+    await nodes_collection.create_index([("user_id", 1), ("node_id", 1), ("active", 1)])
+    await nodes_collection.create_index([("completed", 1), ("active", 1), ("completion_time", 1)])
+    await nodes_collection.create_index("settlement_id", sparse=True)
+    await nodes_collection.create_index("credited", sparse=True)
+    await referrals_collection.create_index("referrer_id")
+    await referrals_collection.create_index("referred_user_id", unique=True)
+    await transactions_collection.create_index([("user_id", 1), ("timestamp", -1)])
+
+@app.on_event("startup")
+async def backfill_completion_time():
+    # Nodes bought before completion_time was stored
+    await nodes_collection.update_many(
+        {"completion_time": {"$exists": False}},
+        [{"$set": {"completion_time": {
+            "$add": ["$purchase_time", {"$multiply": ["$duration_days", 24 * 60 * 60 * 1000]}]
+        }}}]
+    )
+
 # API Routes
-@app.post("/api/auth/signup")
+@app.post("/api/auth/signup", response_model=SignupResponse)
 async def signup(user_data: UserSignup):
     # Check if username already exists
-    if users_collection.find_one({"username": user_data.username}):
+    if await users_collection.find_one({"username": user_data.username}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="Username already exists")
     
     # Validate referral code if provided
     referrer_id = None
     if user_data.refer_code:
-        referrer = users_collection.find_one({"refer_code": user_data.refer_code})
+        referrer = await users_collection.find_one({"refer_code": user_data.refer_code}, {"_id": 1})
         if not referrer:
             raise HTTPException(status_code=400, detail="Invalid referral code")
         referrer_id = referrer["_id"]
     
     # Create user
     user_id = str(uuid.uuid4())
-    refer_code = generate_refer_code()
     
     user = {
         "_id": user_id,
         "username": user_data.username,
-        "password": hash_password(user_data.password),
-        "refer_code": refer_code,
+        "password": await run_in_threadpool(hash_password, user_data.password),
+        "refer_code": generate_refer_code(),
         "mine_balance": 25.0,  # Sign up bonus
         "referral_balance": 0.0,
         "has_purchased_node": False,
@@ -173,11 +435,21 @@ async def signup(user_data: UserSignup):
         "created_at": datetime.utcnow()
     }
     
-    users_collection.insert_one(user)
+    # Retry on the rare refer code collision; the unique index catches it
+    for attempt in range(REFER_CODE_ATTEMPTS):
+        try:
+            await users_collection.insert_one(user)
+            break
+        except DuplicateKeyError as e:
+            if "refer_code" not in (e.details or {}).get("keyPattern", {}):
+                raise HTTPException(status_code=400, detail="Username already exists")
+            if attempt == REFER_CODE_ATTEMPTS - 1:
+                raise HTTPException(status_code=500, detail="Could not allocate a referral code")
+            user["refer_code"] = generate_refer_code()
     
     # Track referral if exists
     if referrer_id:
-        referrals_collection.insert_one({
+        await referrals_collection.insert_one({
             "_id": str(uuid.uuid4()),
             "referrer_id": referrer_id,
             "referred_user_id": user_id,
@@ -187,87 +459,55 @@ async def signup(user_data: UserSignup):
     
     token = create_jwt_token(user_id)
     
-    return {
-        "success": True,
-        "message": "Sign up successful! Claim your 25 TRX bonus!",
-        "token": token,
-        "user": {
-            "id": user_id,
-            "username": user_data.username,
-            "refer_code": refer_code,
-            "mine_balance": 25.0,
-            "referral_balance": 0.0
-        }
-    }
+    return SignupResponse(
+        success=True,
+        message="Sign up successful! Claim your 25 TRX bonus!",
+        token=token,
+        user=UserOut.model_validate(user)
+    )
 
-@app.post("/api/auth/login")
+@app.post("/api/auth/login", response_model=LoginResponse)
 async def login(user_data: UserLogin):
-    user = users_collection.find_one({
-        "username": user_data.username,
-        "password": hash_password(user_data.password)
-    })
+    user = await users_collection.find_one({"username": user_data.username})
     
-    if not user:
+    if user is None:
+        await run_in_threadpool(verify_password, user_data.password, _DUMMY_PASSWORD_HASH)
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    if not await run_in_threadpool(verify_password, user_data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
+    # Upgrade legacy SHA-256 hashes on successful login
+    if pwd_context.identify(user["password"]) is None:
+        await users_collection.update_one(
+            {"_id": user["_id"]},
+            {"$set": {"password": await run_in_threadpool(hash_password, user_data.password)}}
+        )
+    
     token = create_jwt_token(user["_id"])
     
-    return {
-        "success": True,
-        "token": token,
-        "user": {
-            "id": user["_id"],
-            "username": user["username"],
-            "refer_code": user["refer_code"],
-            "mine_balance": user["mine_balance"],
-            "referral_balance": user["referral_balance"]
-        }
-    }
+    return LoginResponse(success=True, token=token, user=UserOut.model_validate(user))
 
-@app.get("/api/user/profile")
+@app.get("/api/user/profile", response_model=ProfileResponse)
 async def get_profile(current_user: str = Depends(get_current_user)):
-    user = users_collection.find_one({"_id": current_user})
+    user = await users_collection.find_one({"_id": current_user}, PROFILE_FIELDS)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get user's nodes
-    user_nodes = list(nodes_collection.find({"user_id": current_user}))
-    
-    # Update mining progress and balances
-    for node in user_nodes:
-        if node.get("active", False):
-            progress = calculate_mining_progress(node)
-            if progress >= 100 and not node.get("completed", False):
-                # Mining completed, add to balance
-                users_collection.update_one(
-                    {"_id": current_user},
-                    {"$inc": {"mine_balance": node["mining_amount"]}}
-                )
-                nodes_collection.update_one(
-                    {"_id": node["_id"]},
-                    {"$set": {"completed": True, "active": False}}
-                )
-                user["mine_balance"] += node["mining_amount"]
-    
-    return {
-        "user": {
-            "id": user["_id"],
-            "username": user["username"],
-            "refer_code": user["refer_code"],
-            "mine_balance": user["mine_balance"],
-            "referral_balance": user["referral_balance"],
-            "has_purchased_node": user.get("has_purchased_node", False),
-            "has_purchased_node4": user.get("has_purchased_node4", False)
-        }
-    }
+    return ProfileResponse(user=ProfileUserOut.model_validate(user))
 
-@app.get("/api/nodes")
+@app.get("/api/nodes", response_model=NodesResponse)
 async def get_nodes(current_user: str = Depends(get_current_user)):
-    user_nodes = list(nodes_collection.find({"user_id": current_user}))
+    # Oldest first, so a node rebought before the settler deactivated the
+    # finished one is the one reported
+    user_nodes = await nodes_collection.find(
+        {"user_id": current_user, "active": True}
+    ).sort("purchase_time", 1).to_list(length=None)
+    active_by_id = {n["node_id"]: n for n in user_nodes}
     
     nodes_status = {}
     for node_id, config in NODE_CONFIGS.items():
-        user_node = next((n for n in user_nodes if n["node_id"] == node_id and n.get("active", False)), None)
+        user_node = active_by_id.get(node_id)
         
         if user_node:
             progress = calculate_mining_progress(user_node)
@@ -279,17 +519,10 @@ async def get_nodes(current_user: str = Depends(get_current_user)):
                 "active": user_node.get("active", False),
                 "progress": progress,
                 "can_rebuy": can_rebuy,
-                "purchase_time": user_node.get("purchase_time").isoformat() if user_node.get("purchase_time") else None
+                "purchase_time": user_node.get("purchase_time")
             }
         else:
-            nodes_status[node_id] = {
-                "config": config,
-                "owned": False,
-                "active": False,
-                "progress": 0,
-                "can_rebuy": True,
-                "purchase_time": None
-            }
+            nodes_status[node_id] = UNOWNED_NODE_STATUS[node_id]
     
     return {"nodes": nodes_status}
 
@@ -300,11 +533,15 @@ async def purchase_node(purchase_data: NodePurchase, current_user: str = Depends
     
     config = NODE_CONFIGS[purchase_data.node_id]
     
-    # Check if user already owns this active node
-    existing_node = nodes_collection.find_one({
+    # Check if user already owns this active node. A node whose mining period
+    # has ended can be rebought even before the settler has deactivated it,
+    # matching the can_rebuy flag /api/nodes reports
+    purchase_time = datetime.utcnow()
+    existing_node = await nodes_collection.find_one({
         "user_id": current_user,
         "node_id": purchase_data.node_id,
-        "active": True
+        "active": True,
+        "completion_time": {"$gt": purchase_time}
     })
     
     if existing_node:
@@ -324,39 +561,40 @@ async def purchase_node(purchase_data: NodePurchase, current_user: str = Depends
         "price": config["price"],
         "mining_amount": config["mining_amount"],
         "duration_days": config["duration_days"],
-        "purchase_time": datetime.utcnow(),
+        "purchase_time": purchase_time,
+        "completion_time": purchase_time + timedelta(days=config["duration_days"]),
         "active": True,
         "completed": False,
         "transaction_hash": purchase_data.transaction_hash
     }
     
-    nodes_collection.insert_one(node)
-    
-    # Check if this is user's first purchase BEFORE updating status
-    user = users_collection.find_one({"_id": current_user})
-    is_first_purchase = not user.get("has_purchased_node", False)
-    
     # Update user status
     update_data = {"has_purchased_node": True}
     if purchase_data.node_id == "node4":
         update_data["has_purchased_node4"] = True
     
-    users_collection.update_one(
+    # Insert the node before flagging the user, so a failed insert never
+    # unlocks withdrawals or uses up the referral validation. The pre-update
+    # user document tells us whether this was the user's first purchase
+    await nodes_collection.insert_one(node)
+    user = await users_collection.find_one_and_update(
         {"_id": current_user},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection=PROFILE_FIELDS,
+        return_document=ReturnDocument.BEFORE
     )
+    is_first_purchase = user is not None and not user.get("has_purchased_node", False)
     
     # Validate referral if this is user's first purchase
     if is_first_purchase:
-        referral = referrals_collection.find_one({"referred_user_id": current_user})
-        if referral and not referral.get("is_valid", False):
-            # Make referral valid and reward referrer
-            referrals_collection.update_one(
-                {"_id": referral["_id"]},
-                {"$set": {"is_valid": True, "validated_at": datetime.utcnow()}}
-            )
-            
-            users_collection.update_one(
+        # Flip is_valid atomically so the referrer is rewarded at most once
+        referral = await referrals_collection.find_one_and_update(
+            {"referred_user_id": current_user, "is_valid": {"$ne": True}},
+            {"$set": {"is_valid": True, "validated_at": datetime.utcnow()}},
+            projection={"referrer_id": 1}
+        )
+        if referral:
+            await users_collection.update_one(
                 {"_id": referral["referrer_id"]},
                 {"$inc": {"referral_balance": 50.0}}
             )
@@ -369,12 +607,14 @@ async def purchase_node(purchase_data: NodePurchase, current_user: str = Depends
             "name": config["name"],
             "mining_amount": config["mining_amount"],
             "duration_days": config["duration_days"]
-        }
+        },
+        # Post-purchase profile, so clients don't need to re-fetch it
+        "user": ProfileUserOut.model_validate({**user, **update_data}).model_dump() if user else None
     }
 
 @app.post("/api/withdraw")
 async def withdraw(withdraw_data: WithdrawRequest, current_user: str = Depends(get_current_user)):
-    user = users_collection.find_one({"_id": current_user})
+    user = await users_collection.find_one({"_id": current_user}, WITHDRAW_FIELDS)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -389,11 +629,7 @@ async def withdraw(withdraw_data: WithdrawRequest, current_user: str = Depends(g
         if not user.get("has_purchased_node", False):
             raise HTTPException(status_code=400, detail="You must purchase any node first to withdraw from mine balance")
         
-        # Process withdrawal
-        users_collection.update_one(
-            {"_id": current_user},
-            {"$inc": {"mine_balance": -withdraw_data.amount}}
-        )
+        balance_field = "mine_balance"
         
     elif withdraw_data.balance_type == "referral":
         if withdraw_data.amount < 50:
@@ -406,17 +642,22 @@ async def withdraw(withdraw_data: WithdrawRequest, current_user: str = Depends(g
         if not user.get("has_purchased_node4", False):
             raise HTTPException(status_code=400, detail="You must purchase Node 4 (1024 GB) to withdraw from referral balance")
         
-        # Process withdrawal
-        users_collection.update_one(
-            {"_id": current_user},
-            {"$inc": {"referral_balance": -withdraw_data.amount}}
-        )
+        balance_field = "referral_balance"
     
     else:
         raise HTTPException(status_code=400, detail="Invalid balance type")
     
+    # Process withdrawal, returning the updated profile so clients don't need
+    # to re-fetch it
+    updated_user = await users_collection.find_one_and_update(
+        {"_id": current_user},
+        {"$inc": {balance_field: -withdraw_data.amount}},
+        projection=PROFILE_FIELDS,
+        return_document=ReturnDocument.AFTER
+    )
+    
     # Record transaction
-    transactions_collection.insert_one({
+    await transactions_collection.insert_one({
         "_id": str(uuid.uuid4()),
         "user_id": current_user,
         "type": "withdrawal",
@@ -427,34 +668,48 @@ async def withdraw(withdraw_data: WithdrawRequest, current_user: str = Depends(g
     
     return {
         "success": True,
-        "message": f"Successfully withdrew {withdraw_data.amount} TRX from {withdraw_data.balance_type} balance"
+        "message": f"Successfully withdrew {withdraw_data.amount} TRX from {withdraw_data.balance_type} balance",
+        "user": ProfileUserOut.model_validate(updated_user).model_dump() if updated_user else None
     }
 
 @app.get("/api/referrals")
 async def get_referrals(current_user: str = Depends(get_current_user)):
-    user = users_collection.find_one({"_id": current_user})
+    user = await users_collection.find_one({"_id": current_user}, {"refer_code": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get all referrals
-    referrals = list(referrals_collection.find({"referrer_id": current_user}))
+    # Get all referrals joined with the referred users' usernames
+    referrals = await referrals_collection.aggregate([
+        {"$match": {"referrer_id": current_user}},
+        {"$lookup": {
+            "from": "users",
+            "localField": "referred_user_id",
+            "foreignField": "_id",
+            "as": "referred_user"
+        }},
+        {"$unwind": "$referred_user"},
+        {"$project": {
+            "_id": 0,
+            "username": "$referred_user.username",
+            "created_at": 1,
+            "is_valid": {"$ifNull": ["$is_valid", False]}
+        }}
+    ]).to_list(length=None)
     
     valid_referrals = []
     invalid_referrals = []
     
     for referral in referrals:
-        referred_user = users_collection.find_one({"_id": referral["referred_user_id"]})
-        if referred_user:
-            referral_info = {
-                "username": referred_user["username"],
-                "joined_at": referral["created_at"].isoformat(),
-                "is_valid": referral.get("is_valid", False)
-            }
-            
-            if referral.get("is_valid", False):
-                valid_referrals.append(referral_info)
-            else:
-                invalid_referrals.append(referral_info)
+        referral_info = {
+            "username": referral["username"],
+            "joined_at": referral["created_at"],
+            "is_valid": referral["is_valid"]
+        }
+        
+        if referral["is_valid"]:
+            valid_referrals.append(referral_info)
+        else:
+            invalid_referrals.append(referral_info)
     
     return {
         "refer_code": user["refer_code"],
@@ -465,25 +720,23 @@ async def get_referrals(current_user: str = Depends(get_current_user)):
 
 @app.get("/api/mock-withdrawals")
 async def get_mock_withdrawals():
-    # Generate mock withdrawal data for homepage animation
-    mock_withdrawals = []
-    for _ in range(10):
-        amount = random.randint(25, 10000)
-        timestamp = datetime.utcnow() - timedelta(seconds=random.randint(0, 3600))
-        mock_withdrawals.append({
-            "amount": amount,
-            "timestamp": timestamp.isoformat()
-        })
-    
-    return {"withdrawals": mock_withdrawals}
+    return Response(content=_mock_withdrawals_json, media_type="application/json")
 
 @app.get("/api/config")
 async def get_config():
-    return {
-        "trx_address": TRX_RECEIVE_ADDRESS,
-        "nodes": NODE_CONFIGS
-    }
+    return Response(content=_CONFIG_JSON, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # Each worker imports this module itself, so the Mongo client and
+    # its pool are per-process: keep maxPoolSize * workers under the
+    # cluster's connection limit.
+    uvicorn.run(
+        "server:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host="0.0.0.0",
+        port=8001,
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools"
+    )
\ No newline at end of file
@@ -3,175 +3,235 @@
 Additional comprehensive test for Node 4 and referral balance withdrawal
 """
 
+import collections
+import functools
+import logging
+import os
+import pathlib
 import requests
-import json
+import orjson
 import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
-# Get backend URL from frontend .env file
+# Get backend URL from the environment, else the frontend .env file
+@functools.lru_cache(maxsize=1)
 def get_backend_url():
+    url = os.environ.get("REACT_APP_BACKEND_URL")
+    if url:
+        return url
     try:
-        with open('/app/frontend/.env', 'r') as f:
-            for line in f:
-                if line.startswith('REACT_APP_BACKEND_URL='):
-                    return line.split('=', 1)[1].strip()
-    except:
-        pass
-    return "http://localhost:8001"
+        lines = pathlib.Path('/app/frontend/.env').read_text().splitlines()
+    except OSError:
+        return "http://localhost:8001"
+    env = dict(line.split('=', 1) for line in lines if '=' in line and not line.startswith('#'))
+    return env.get('REACT_APP_BACKEND_URL', "http://localhost:8001").strip()
+
+logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.StreamHandler(sys.stdout)])
+log = logging.getLogger("node4_test")
 
 BASE_URL = get_backend_url()
 API_URL = f"{BASE_URL}/api"
 
-def generate_test_username():
-    return f"node4user_{random.randint(10000, 99999)}"
+TestCreds = collections.namedtuple('TestCreds', 'username password')
 
-def generate_test_password():
-    return f"TestPass{random.randint(100, 999)}!"
+# Both users' credentials, drawn up front; random.sample keeps the usernames distinct
+creds = [
+    TestCreds(f"node4user_{n}", f"TestPass{random.randint(100, 999)}!")
+    for n in random.sample(range(10000, 100000), k=2)
+]
 
-print("🧪 Testing Node 4 Purchase and Referral Balance Withdrawal")
-print(f"Backend URL: {API_URL}")
+log.info("🧪 Testing Node 4 Purchase and Referral Balance Withdrawal")
+log.info("Backend URL: %s", API_URL)
 
+# One pooled keep-alive session for every step; transient gateway errors
+# and dropped connections are retried by the adapter
 session = requests.Session()
-
-# Create a user with referral balance
-print("\n1. Creating user and setting up referral...")
-username = generate_test_username()
-password = generate_test_password()
-
-signup_data = {
-    "username": username,
-    "password": password
-}
-
-response = session.post(f"{API_URL}/auth/signup", json=signup_data)
-if response.status_code == 200:
-    data = response.json()
-    token = data['token']
-    refer_code = data['user']['refer_code']
-    print(f"✅ User created: {username}")
-    print(f"✅ Refer code: {refer_code}")
-else:
-    print(f"❌ Failed to create user: {response.status_code}")
-    exit(1)
-
-# Create referred user
-print("\n2. Creating referred user...")
-referred_username = generate_test_username()
-referred_password = generate_test_password()
-
-referred_signup_data = {
-    "username": referred_username,
-    "password": referred_password,
-    "refer_code": refer_code
-}
-
-response = session.post(f"{API_URL}/auth/signup", json=referred_signup_data)
-if response.status_code == 200:
-    referred_data = response.json()
-    referred_token = referred_data['token']
-    print(f"✅ Referred user created: {referred_username}")
-else:
-    print(f"❌ Failed to create referred user: {response.status_code}")
-    exit(1)
-
-# Make referred user purchase a node to validate referral
-print("\n3. Referred user purchasing node to validate referral...")
-referred_headers = {"Authorization": f"Bearer {referred_token}"}
-purchase_data = {
-    "node_id": "node1",
-    "transaction_hash": "mock_tx_hash_for_referral_validation_12345678901234567890"
-}
-
-response = session.post(f"{API_URL}/nodes/purchase", json=purchase_data, headers=referred_headers)
-if response.status_code == 200:
-    print("✅ Referred user purchased node")
-else:
-    print(f"❌ Failed to purchase node: {response.status_code}")
-    exit(1)
-
-# Check if referrer got 50 TRX referral balance
-print("\n4. Checking referrer's referral balance...")
-headers = {"Authorization": f"Bearer {token}"}
-response = session.get(f"{API_URL}/user/profile", headers=headers)
-if response.status_code == 200:
-    data = response.json()
-    referral_balance = data['user']['referral_balance']
-    print(f"✅ Referrer's referral balance: {referral_balance} TRX")
+adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+session.headers.update({"Content-Type": "application/json", "Connection": "keep-alive"})
+
+def _post(url, payload, headers=None):
+    """POST payload encoded with orjson; the session already sends the JSON content type"""
+    return session.post(url, data=orjson.dumps(payload), headers=headers)
+
+def _body(response):
+    """Decode a response body with orjson"""
+    return orjson.loads(response.content)
+
+# Last known profile per token; mutation responses carry the updated user, so
+# it is only re-fetched when something else changed it
+_profile_cache = {}
+
+def get_profile(token, force=False):
+    """Profile for token, from the cache unless forced or missing; None if the fetch fails"""
+    if force or token not in _profile_cache:
+        response = session.get(f"{API_URL}/user/profile", headers={"Authorization": f"Bearer {token}"})
+        if response.status_code != 200:
+            log.error("❌ Failed to get profile: %s", response.status_code)
+            return None
+        _profile_cache[token] = _body(response)['user']
+    return _profile_cache[token]
+
+def remember_user(token, data):
+    """Cache the user a mutation response returned, or drop the now-stale entry"""
+    if data.get('user'):
+        _profile_cache[token] = data['user']
+    else:
+        _profile_cache.pop(token, None)
+
+with session:
+    # Create a user with referral balance
+    log.info("\n1. Creating user and setting up referral...")
+    username, password = creds[0]
+
+    signup_data = {
+        "username": username,
+        "password": password
+    }
+
+    response = _post(f"{API_URL}/auth/signup", signup_data)
+    if response.status_code == 200:
+        data = _body(response)
+        token = data['token']
+        refer_code = data['user']['refer_code']
+        remember_user(token, data)
+        log.info("✅ User created: %s", username)
+        log.info("✅ Refer code: %s", refer_code)
+    else:
+        log.error("❌ Failed to create user: %s", response.status_code)
+        raise SystemExit(1)
+
+    # Create referred user
+    log.info("\n2. Creating referred user...")
+    referred_username, referred_password = creds[1]
+
+    referred_signup_data = {
+        "username": referred_username,
+        "password": referred_password,
+        "refer_code": refer_code
+    }
+
+    response = _post(f"{API_URL}/auth/signup", referred_signup_data)
+    if response.status_code == 200:
+        referred_data = _body(response)
+        referred_token = referred_data['token']
+        remember_user(referred_token, referred_data)
+        log.info("✅ Referred user created: %s", referred_username)
+    else:
+        log.error("❌ Failed to create referred user: %s", response.status_code)
+        raise SystemExit(1)
+
+    # Make referred user purchase a node to validate referral
+    log.info("\n3. Referred user purchasing node to validate referral...")
+    referred_headers = {"Authorization": f"Bearer {referred_token}"}
+    purchase_data = {
+        "node_id": "node1",
+        "transaction_hash": "mock_tx_hash_for_referral_validation_12345678901234567890"
+    }
+
+    response = _post(f"{API_URL}/nodes/purchase", purchase_data, headers=referred_headers)
+    if response.status_code == 200:
+        remember_user(referred_token, _body(response))
+        log.info("✅ Referred user purchased node")
+    else:
+        log.error("❌ Failed to purchase node: %s", response.status_code)
+        raise SystemExit(1)
+
+    headers = {"Authorization": f"Bearer {token}"}
+    withdraw_data = {
+        "balance_type": "referral",
+        "amount": 50.0
+    }
+
+    # Steps 4 and 5 only need the referral to have been validated and don't
+    # change any state, so issue them together. The referral reward reached
+    # the referrer through another user's purchase, which only returned that
+    # user's profile, so the referrer's has to be re-fetched
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        profile_future = executor.submit(get_profile, token, force=True)
+        early_withdraw_future = executor.submit(
+            _post, f"{API_URL}/withdraw", withdraw_data, headers
+        )
+
+    # Check if referrer got 50 TRX referral balance
+    log.info("\n4. Checking referrer's referral balance...")
+    profile = profile_future.result()
+    if profile is None:
+        raise SystemExit(1)
+    referral_balance = profile['referral_balance']
+    log.info("✅ Referrer's referral balance: %s TRX", referral_balance)
     
     if referral_balance >= 50:
-        print("✅ Referral reward received correctly!")
+        log.info("✅ Referral reward received correctly!")
+    else:
+        log.error("❌ Referral reward not received")
+        raise SystemExit(1)
+
+    # Try to withdraw referral balance without Node 4 (should fail)
+    log.info("\n5. Trying to withdraw referral balance without Node 4...")
+    response = early_withdraw_future.result()
+    if response.status_code == 400:
+        log.info("✅ Correctly prevented referral withdrawal without Node 4")
+    else:
+        log.error("❌ Should have prevented withdrawal: %s", response.status_code)
+
+    # Purchase Node 4
+    log.info("\n6. Purchasing Node 4...")
+    node4_purchase_data = {
+        "node_id": "node4",
+        "transaction_hash": "mock_tx_hash_node4_purchase_12345678901234567890"
+    }
+
+    response = _post(f"{API_URL}/nodes/purchase", node4_purchase_data, headers=headers)
+    if response.status_code == 200:
+        data = _body(response)
+        remember_user(token, data)
+        log.info("✅ Successfully purchased %s", data['node']['name'])
     else:
-        print("❌ Referral reward not received")
-        exit(1)
-else:
-    print(f"❌ Failed to get profile: {response.status_code}")
-    exit(1)
-
-# Try to withdraw referral balance without Node 4 (should fail)
-print("\n5. Trying to withdraw referral balance without Node 4...")
-withdraw_data = {
-    "balance_type": "referral",
-    "amount": 50.0
-}
-
-response = session.post(f"{API_URL}/withdraw", json=withdraw_data, headers=headers)
-if response.status_code == 400:
-    print("✅ Correctly prevented referral withdrawal without Node 4")
-else:
-    print(f"❌ Should have prevented withdrawal: {response.status_code}")
-
-# Purchase Node 4
-print("\n6. Purchasing Node 4...")
-node4_purchase_data = {
-    "node_id": "node4",
-    "transaction_hash": "mock_tx_hash_node4_purchase_12345678901234567890"
-}
-
-response = session.post(f"{API_URL}/nodes/purchase", json=node4_purchase_data, headers=headers)
-if response.status_code == 200:
-    data = response.json()
-    print(f"✅ Successfully purchased {data['node']['name']}")
-else:
-    print(f"❌ Failed to purchase Node 4: {response.status_code}")
-    exit(1)
-
-# Check user profile shows Node 4 purchased
-print("\n7. Verifying Node 4 purchase status...")
-response = session.get(f"{API_URL}/user/profile", headers=headers)
-if response.status_code == 200:
-    data = response.json()
-    has_node4 = data['user']['has_purchased_node4']
-    print(f"✅ Has purchased Node 4: {has_node4}")
+        log.error("❌ Failed to purchase Node 4: %s", response.status_code)
+        raise SystemExit(1)
+
+    # Check user profile shows Node 4 purchased
+    log.info("\n7. Verifying Node 4 purchase status...")
+    profile = get_profile(token)
+    if profile is None:
+        raise SystemExit(1)
+    has_node4 = profile['has_purchased_node4']
+    log.info("✅ Has purchased Node 4: %s", has_node4)
     
     if not has_node4:
-        print("❌ Node 4 purchase not reflected in profile")
-        exit(1)
-else:
-    print(f"❌ Failed to get profile: {response.status_code}")
-    exit(1)
-
-# Now try to withdraw referral balance (should succeed)
-print("\n8. Withdrawing referral balance after Node 4 purchase...")
-response = session.post(f"{API_URL}/withdraw", json=withdraw_data, headers=headers)
-if response.status_code == 200:
-    data = response.json()
-    print(f"✅ Successfully withdrew referral balance: {data['message']}")
-else:
-    print(f"❌ Failed to withdraw referral balance: {response.status_code}")
-    exit(1)
-
-# Verify balance was deducted
-print("\n9. Verifying balance was deducted...")
-response = session.get(f"{API_URL}/user/profile", headers=headers)
-if response.status_code == 200:
-    data = response.json()
-    new_referral_balance = data['user']['referral_balance']
-    print(f"✅ New referral balance: {new_referral_balance} TRX")
-    
-    if new_referral_balance == 0:
-        print("✅ Balance correctly deducted!")
+        log.error("❌ Node 4 purchase not reflected in profile")
+        raise SystemExit(1)
+
+    # Now try to withdraw referral balance (should succeed)
+    log.info("\n8. Withdrawing referral balance after Node 4 purchase...")
+    response = _post(f"{API_URL}/withdraw", withdraw_data, headers=headers)
+    if response.status_code == 200:
+        data = _body(response)
+        remember_user(token, data)
+        log.info("✅ Successfully withdrew referral balance: %s", data['message'])
     else:
-        print(f"❌ Balance not deducted correctly, expected 0, got {new_referral_balance}")
-else:
-    print(f"❌ Failed to get profile: {response.status_code}")
-
-print("\n🎉 All Node 4 and referral balance withdrawal tests passed!")
\ No newline at end of file
+        log.error("❌ Failed to withdraw referral balance: %s", response.status_code)
+        raise SystemExit(1)
+
+    # Verify balance was deducted
+    log.info("\n9. Verifying balance was deducted...")
+    profile = get_profile(token)
+    if profile is not None:
+        new_referral_balance = profile['referral_balance']
+        log.info("✅ New referral balance: %s TRX", new_referral_balance)
+        
+        if new_referral_balance == 0:
+            log.info("✅ Balance correctly deducted!")
+        else:
+            log.error("❌ Balance not deducted correctly, expected 0, got %s", new_referral_balance)
+
+    log.info("\n🎉 All Node 4 and referral balance withdrawal tests passed!")
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+Tests for the background node settlement in backend/server.py
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+import server  # noqa: E402
+
+
+def matches(doc, query):
+    """Whether doc satisfies the subset of MongoDB query syntax the settler uses"""
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+                return False
+            if "$in" in condition:
+                values = value if isinstance(value, list) else [value]
+                if not any(v in condition["$in"] for v in values):
+                    return False
+        elif isinstance(value, list):
+            if condition not in value:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def evaluate(expr, doc, new):
+    """Evaluate the aggregation expressions used in the settler's $merge pipeline"""
+    if isinstance(expr, str):
+        if expr.startswith("$$new."):
+            return new[expr[len("$$new."):]]
+        if expr.startswith("$"):
+            return doc.get(expr[1:])
+        return expr
+    if isinstance(expr, list):
+        return [evaluate(e, doc, new) for e in expr]
+    if isinstance(expr, dict):
+        (op, args), = expr.items()
+        args = [evaluate(a, doc, new) for a in args]
+        if op == "$add":
+            return sum(args)
+        if op == "$ifNull":
+            return args[0] if args[0] is not None else args[1]
+        if op == "$in":
+            return args[0] in args[1]
+        if op == "$cond":
+            return args[1] if args[0] else args[2]
+        if op == "$setUnion":
+            return list(dict.fromkeys(x for a in args for x in a))
+        raise NotImplementedError(op)
+    return expr
+
+
+class FakeCollection:
+    """In-memory stand-in for the Motor collection methods the settler calls"""
+
+    def __init__(self, docs, users=None):
+        self.docs = docs
+        self.users = users
+        self.fail_merges = 0
+        self.before_update_many = None
+
+    async def distinct(self, field, query):
+        return list(dict.fromkeys(d[field] for d in self.docs if matches(d, query)))
+
+    async def update_many(self, query, update):
+        if self.before_update_many is not None:
+            await self.before_update_many(query, update)
+        modified = 0
+        for doc in self.docs:
+            if not matches(doc, query):
+                continue
+            doc.update(update.get("$set", {}))
+            for field, condition in update.get("$pull", {}).items():
+                removed = condition["$in"] if isinstance(condition, dict) else [condition]
+                doc[field] = [v for v in doc.get(field, []) if v not in removed]
+            modified += 1
+        return MagicMock(modified_count=modified)
+
+    def aggregate(self, pipeline):
+        cursor = MagicMock()
+        cursor.to_list = lambda length=None: self._aggregate(pipeline)
+        return cursor
+
+    async def _aggregate(self, pipeline):
+        match, group, merge = (stage for stage in pipeline)
+        if self.fail_merges:
+            self.fail_merges -= 1
+            raise RuntimeError("merge failed")
+        totals = {}
+        for doc in self.docs:
+            if matches(doc, match["$match"]):
+                totals[doc["user_id"]] = totals.get(doc["user_id"], 0) + doc["mining_amount"]
+        set_stage = merge["$merge"]["whenMatched"][0]["$set"]
+        for user in self.users.docs:
+            if user["_id"] in totals:
+                new = {"total": totals[user["_id"]]}
+                user.update({field: evaluate(expr, user, new) for field, expr in set_stage.items()})
+        return []
+
+
+def make_collections():
+    due = datetime.utcnow() - timedelta(days=1)
+    users = FakeCollection([
+        {"_id": "u1", "mine_balance": 25.0},
+        {"_id": "u2", "mine_balance": 25.0},
+    ])
+    nodes = FakeCollection([
+        {"_id": "n1", "user_id": "u1", "mining_amount": 500, "active": True, "completed": False, "completion_time": due},
+        {"_id": "n2", "user_id": "u1", "mining_amount": 1000, "active": True, "completed": False, "completion_time": due},
+        {"_id": "n3", "user_id": "u2", "mining_amount": 500, "active": True, "completed": False, "completion_time": due},
+    ], users)
+    return nodes, users
+
+
+def run(coro, nodes, users):
+    """Run coro against the fake collections on a loop left current for later tests"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    with patch.object(server, "nodes_collection", nodes), \
+            patch.object(server, "users_collection", users), \
+            patch.object(server, "_flagged_settlements", []):
+        return loop.run_until_complete(coro())
+
+
+def balances(users):
+    return {u["_id"]: u["mine_balance"] for u in users.docs}
+
+
+def test_due_nodes_are_credited_once():
+    nodes, users = make_collections()
+
+    async def ticks():
+        await server.settle_completed_nodes()
+        await server.settle_completed_nodes()
+
+    run(ticks, nodes, users)
+
+    assert balances(users) == {"u1": 1525.0, "u2": 525.0}
+    assert all(n["credited"] and n["completed"] and not n["active"] for n in nodes.docs)
+    # The second tick pulled the markers left by the first
+    assert all(not u["settlements"] for u in users.docs)
+
+
+def test_failed_credit_is_retried_next_tick():
+    nodes, users = make_collections()
+    nodes.fail_merges = 1
+
+    async def ticks():
+        try:
+            await server.settle_completed_nodes()
+        except RuntimeError:
+            pass
+        assert balances(users) == {"u1": 25.0, "u2": 25.0}
+        assert all(n["credited"] is False for n in nodes.docs)
+        await server.settle_completed_nodes()
+
+    run(ticks, nodes, users)
+
+    assert balances(users) == {"u1": 1525.0, "u2": 525.0}
+    assert all(n["credited"] for n in nodes.docs)
+
+
+def test_concurrent_credit_between_merge_and_flag():
+    nodes, users = make_collections()
+
+    async def settle():
+        # Another worker credits the same settlement after this one's $merge
+        # but before it flags the nodes
+        async def interleave(query, update):
+            if update == {"$set": {"credited": True}}:
+                nodes.before_update_many = None
+                await server.credit_settlement(query["settlement_id"])
+        nodes.before_update_many = interleave
+        await server.settle_completed_nodes()
+
+    run(settle, nodes, users)
+
+    assert balances(users) == {"u1": 1525.0, "u2": 525.0}
+
+
+def test_stale_recovery_after_markers_are_pulled():
+    nodes, users = make_collections()
+
+    async def settle():
+        await server.settle_completed_nodes()
+        settlement_id = nodes.docs[0]["settlement_id"]
+        # Next tick pulls the markers; a worker that saw the settlement as
+        # pending before it was flagged then gets to it
+        await server.settle_completed_nodes()
+        await server.credit_settlement(settlement_id)
+
+    run(settle, nodes, users)
+
+    assert balances(users) == {"u1": 1525.0, "u2": 525.0}